@@ -0,0 +1,650 @@
+"""
+Shared FMP tool implementations.
+All HTTP plumbing (shared client, TTL cache, single-flight, throttling) and
+the tool definitions live here; server.py builds the FastMCP instance for
+the chosen transport and calls register() on it.
+"""
+import os
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import AsyncIterator, Optional
+
+import httpx
+import ijson
+import orjson
+from cachetools import TTLCache
+from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.session import ServerSession
+from mcp.shared.exceptions import McpError
+from mcp.types import ErrorData, INVALID_PARAMS, INTERNAL_ERROR
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+FMP_API_KEY = os.environ.get("FMP_API_KEY", "")
+FMP_BASE_URL = "https://financialmodelingprep.com/stable"
+
+# Fully-parsed request URLs with the API key baked in, built once at import
+# time so the hot path skips URL parsing and the auth-param merge. Caller
+# params dicts are merged copy-on-write and never mutated, which matters
+# because the same dict can sit behind the cache and single-flight layers.
+_URLS = {
+    ep: httpx.URL(f"{FMP_BASE_URL}/{ep}", params={"apikey": FMP_API_KEY})
+    for ep in (
+        "quote", "profile", "search-symbol", "search-name",
+        "income-statement", "balance-sheet-statement", "cash-flow-statement"
+    )
+}
+
+
+def _url_for(endpoint: str, params: dict) -> httpx.URL:
+    """Return the prepared URL for an endpoint with per-call params merged in.
+
+    Path-parameter endpoints (e.g. historical-price-eod/full/{symbol}) are
+    built on the fly rather than cached, since their cardinality is unbounded.
+    """
+    url = _URLS.get(endpoint)
+    if url is None:
+        url = httpx.URL(f"{FMP_BASE_URL}/{endpoint}", params={"apikey": FMP_API_KEY})
+    return url.copy_merge_params(params) if params else url
+
+# Cap concurrent outbound FMP calls so tool fan-out self-throttles near the
+# plan's rate limit instead of provoking 429s; throttled or failing
+# responses are retried with jittered exponential backoff.
+_FMP_SEM = asyncio.Semaphore(int(os.environ.get("FMP_MAX_CONCURRENCY", "10")))
+_RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+_MAX_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+
+# Per-call MCP debug notifications are only emitted when tracing is enabled;
+# formatting and the extra awaits are skipped entirely otherwise.
+_TRACE = os.environ.get("FMP_DEBUG") == "1"
+
+if not FMP_API_KEY:
+    logger.warning("FMP_API_KEY not set. Server will fail on API calls.")
+
+# Shared HTTP client, created on server startup and reused across all tool
+# calls so keep-alive connections (and the TLS handshake) are amortized.
+CLIENT: Optional[httpx.AsyncClient] = None
+_client_lock = asyncio.Lock()
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        # Ask FMP for compressed bodies; httpx decompresses transparently and
+        # brotli beats gzip on the repetitive OHLCV/statement JSON.
+        headers={
+            "Accept-Encoding": "gzip, br",
+            "Accept": "application/json",
+            "User-Agent": "fmp-mcp/1.0"
+        }
+    )
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """Return the shared client, lazily creating it if the lifespan has not run."""
+    global CLIENT
+    if CLIENT is None:
+        async with _client_lock:
+            if CLIENT is None:
+                CLIENT = _build_client()
+    return CLIENT
+
+
+# Response cache TTLs per endpoint family (seconds). Quotes go stale in
+# seconds; profiles, statements and historical EOD data barely change
+# intraday, so repeat calls with identical arguments are served from memory.
+_TTL_SECONDS = {
+    "quote": 30,
+    "profile": 86400,
+    "income-statement": 86400,
+    "balance-sheet-statement": 86400,
+    "cash-flow-statement": 86400,
+    "search-symbol": 3600,
+    "search-name": 3600,
+    "historical-price-eod/full": 3600,
+}
+_CACHES = {family: TTLCache(maxsize=4096, ttl=ttl) for family, ttl in _TTL_SECONDS.items()}
+
+
+def _cache_for(endpoint: str) -> Optional[TTLCache]:
+    """Find the cache for an endpoint, matching path-parameter endpoints by prefix."""
+    cache = _CACHES.get(endpoint)
+    if cache is None:
+        for family, candidate in _CACHES.items():
+            if endpoint.startswith(family + "/"):
+                return candidate
+    return cache
+
+
+def _cache_key(endpoint: str, params: dict) -> tuple:
+    return (endpoint, tuple(sorted((k, v) for k, v in params.items() if k != "apikey")))
+
+
+# Validation helpers shared by all tools. The ErrorData payloads are built
+# once at import time so the hot path only pays for a raise on bad input,
+# and period membership is a single hash lookup against a frozenset.
+_VALID_PERIODS = frozenset(("annual", "quarter"))
+_QUERY_EMPTY = ErrorData(code=INVALID_PARAMS, message="Query parameter cannot be empty")
+_SYMBOL_EMPTY = ErrorData(code=INVALID_PARAMS, message="Symbol parameter cannot be empty")
+_PERIOD_INVALID = ErrorData(code=INVALID_PARAMS, message="Period must be 'annual' or 'quarter'")
+_LIMIT_INVALID = ErrorData(code=INVALID_PARAMS, message="Limit must be between 1 and 100")
+_DATE_INVALID = ErrorData(code=INVALID_PARAMS, message="Dates must be in YYYY-MM-DD format")
+_DATE_ORDER = ErrorData(code=INVALID_PARAMS, message="from_date must not be after to_date")
+
+
+def _http_error(status_code: int, body: str) -> McpError:
+    """Build the McpError for an upstream HTTP failure, truncating the body
+    so huge HTML error pages are not echoed into the MCP channel."""
+    return McpError(ErrorData(
+        code=INTERNAL_ERROR,
+        message=f"FMP API error (HTTP {status_code}): {body[:512]}"
+    ))
+
+
+def _require_query(query: str) -> str:
+    """Return the query or raise INVALID_PARAMS if it is empty."""
+    if not query or not query.strip():
+        raise McpError(_QUERY_EMPTY)
+    return query
+
+
+def _require_symbol(symbol: str) -> str:
+    """Return the upper-cased ticker symbol or raise INVALID_PARAMS if empty."""
+    if not symbol or not symbol.strip():
+        raise McpError(_SYMBOL_EMPTY)
+    return symbol.strip().upper()
+
+
+def _require_period(period: str) -> str:
+    """Return the period or raise INVALID_PARAMS if it is not annual/quarter."""
+    if period not in _VALID_PERIODS:
+        raise McpError(_PERIOD_INVALID)
+    return period
+
+
+def _require_limit(limit: int) -> int:
+    """Return the limit or raise INVALID_PARAMS if outside 1..100."""
+    if limit < 1 or limit > 100:
+        raise McpError(_LIMIT_INVALID)
+    return limit
+
+
+def _require_date(value: str) -> date:
+    """Parse a YYYY-MM-DD date or raise INVALID_PARAMS."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise McpError(_DATE_INVALID) from None
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client if it was created."""
+    global CLIENT
+    if CLIENT is not None:
+        await CLIENT.aclose()
+        CLIENT = None
+
+
+@asynccontextmanager
+async def lifespan(_server: FastMCP) -> AsyncIterator[None]:
+    """Open the shared HTTP client on startup and close it on shutdown.
+
+    Only pass this to the stdio server, where FastMCP enters it once per
+    process. With stateless_http the session manager re-enters the FastMCP
+    lifespan on every HTTP request, which would rebuild the client each time
+    and close other requests' clients mid-flight; that path relies on the
+    lazy _get_client() singleton and closes it from the ASGI app lifespan.
+    """
+    await _get_client()
+    try:
+        yield
+    finally:
+        await close_client()
+
+
+# Above this many bars, a tool result is pre-serialized off the event loop
+# rather than re-encoded by the framework (see get_historical_prices).
+_PRESERIALIZE_THRESHOLD = 1000
+
+# get_historical_prices serves at most this many calendar days per call;
+# older data is reachable by paging with next_cursor.
+_MAX_HISTORY_DAYS = 1825
+
+
+# Identical requests already on the wire, keyed like the cache; concurrent
+# callers await the first caller's future instead of re-hitting FMP.
+_inflight: dict[tuple, asyncio.Future] = {}
+
+
+# Helper function for API calls
+async def fmp_api_call(
+    endpoint: str,
+    params: dict,
+    ctx: Context[ServerSession, None]
+) -> dict | list:
+    """Make authenticated call to FMP API, serving repeats from the TTL cache
+    and coalescing concurrent identical requests into one upstream call"""
+    cache = _cache_for(endpoint)
+    key = _cache_key(endpoint, params)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            if _TRACE:
+                await ctx.debug("FMP cache hit: " + endpoint)
+            return cached
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        return await inflight
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        data = await _fetch(endpoint, params, ctx)
+        if cache is not None:
+            cache[key] = data
+        future.set_result(data)
+        return data
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved; waiters still re-raise on await
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _fetch(
+    endpoint: str,
+    params: dict,
+    ctx: Context[ServerSession, None]
+) -> dict | list:
+    """Issue the HTTP request and map transport errors to McpError"""
+    try:
+        client = await _get_client()
+        url = _url_for(endpoint, params)
+        for attempt in range(_MAX_RETRIES + 1):
+            async with _FMP_SEM:
+                response = await client.get(url)
+            if response.status_code in _RETRY_STATUS and attempt < _MAX_RETRIES:
+                await asyncio.sleep(0.5 * (2 ** attempt) * (1 + random.random()))
+                continue
+            break
+        response.raise_for_status()
+        # orjson parses FMP's numeric-heavy payloads several times faster
+        # than the stdlib json used by response.json()
+        data = orjson.loads(response.content)
+
+        if _TRACE:
+            await ctx.debug(f"FMP {endpoint} -> {response.status_code}")
+
+        return data
+
+    except httpx.HTTPStatusError as e:
+        error = _http_error(e.response.status_code, e.response.text)
+        await ctx.error(error.error.message)
+        raise error
+    except httpx.HTTPError as e:
+        error_msg = f"HTTP request failed: {str(e)}"
+        await ctx.error(error_msg)
+        raise McpError(ErrorData(
+            code=INTERNAL_ERROR,
+            message=error_msg
+        ))
+
+
+async def fmp_api_call_stream(
+    endpoint: str,
+    params: dict,
+    ctx: Context[ServerSession, None],
+    prefix: str = "item"
+) -> list:
+    """Stream a large FMP response and parse it incrementally.
+
+    Rows matching the ijson prefix are decoded chunk-by-chunk while the body
+    is still downloading, so peak memory stays near one 64 KiB chunk plus
+    the parsed rows instead of holding the raw body and the parsed rows at
+    the same time. Used for the multi-megabyte historical price series.
+    """
+    cache = _cache_for(endpoint)
+    key = _cache_key(endpoint, params)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            if _TRACE:
+                await ctx.debug("FMP cache hit: " + endpoint)
+            return cached
+
+    items = ijson.sendable_list()
+    # use_float: default Decimal decoding is not orjson-serializable and
+    # would ship prices/volumes back to the agent as strings
+    parser = ijson.items_coro(items, prefix, use_float=True)
+    try:
+        client = await _get_client()
+        async with _FMP_SEM, client.stream(
+            "GET", _url_for(endpoint, params)
+        ) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode(errors="replace")
+                error = _http_error(response.status_code, body)
+                await ctx.error(error.error.message)
+                raise error
+            async for chunk in response.aiter_bytes(65536):
+                parser.send(chunk)
+        parser.close()
+
+        if _TRACE:
+            await ctx.debug(f"FMP stream {endpoint}: {len(items)} rows")
+
+        data = list(items)
+        if cache is not None:
+            cache[key] = data
+        return data
+
+    except httpx.HTTPError as e:
+        error_msg = f"HTTP request failed: {str(e)}"
+        await ctx.error(error_msg)
+        raise McpError(ErrorData(
+            code=INTERNAL_ERROR,
+            message=error_msg
+        ))
+
+
+# The search, quote/profile, and statement tools are structurally identical
+# within their family, so they are generated from the registry below. Each
+# factory closes over exactly the validation its endpoint needs and registers
+# the resulting coroutine with FastMCP; the docstring from the registry is
+# what the agent sees as the tool description.
+def _make_query_tool(
+    mcp: FastMCP, name: str, endpoint: str, log_label: str, doc: str
+):
+    """Build and register a search-style tool taking a free-text query."""
+    async def tool(
+        query: str,
+        ctx: Context[ServerSession, None]
+    ) -> list[dict]:
+        await ctx.info(f"{log_label}: {query}")
+        return await fmp_api_call(endpoint, {"query": _require_query(query)}, ctx)
+
+    tool.__name__ = name
+    tool.__doc__ = doc
+    return mcp.tool()(tool)
+
+
+def _make_symbol_tool(
+    mcp: FastMCP, name: str, endpoint: str, log_label: str, doc: str
+):
+    """Build and register a tool taking a single ticker symbol."""
+    async def tool(
+        symbol: str,
+        ctx: Context[ServerSession, None]
+    ) -> list[dict]:
+        await ctx.info(f"{log_label}: {symbol}")
+        return await fmp_api_call(endpoint, {"symbol": _require_symbol(symbol)}, ctx)
+
+    tool.__name__ = name
+    tool.__doc__ = doc
+    return mcp.tool()(tool)
+
+
+def _make_statement_tool(
+    mcp: FastMCP, name: str, endpoint: str, log_label: str, doc: str
+):
+    """Build and register a financial-statement tool with period/limit."""
+    async def tool(
+        symbol: str,
+        ctx: Context[ServerSession, None],
+        period: str = "annual",
+        limit: int = 5
+    ) -> list[dict]:
+        await ctx.info(f"{log_label}: {symbol} ({period})")
+        return await fmp_api_call(
+            endpoint,
+            {
+                "symbol": _require_symbol(symbol),
+                "period": _require_period(period),
+                "limit": _require_limit(limit)
+            },
+            ctx
+        )
+
+    tool.__name__ = name
+    tool.__doc__ = doc
+    return mcp.tool()(tool)
+
+
+_TOOLS = [
+    (_make_query_tool, "search_symbol", "search-symbol", "Searching for symbol",
+     """Stock Symbol Search - Use when you have a company name or partial ticker 
+    and want to find matching ticker symbols and basic metadata.
+    
+    Args:
+        query: Search text (company name or symbol fragment)
+        
+    Returns:
+        List of matching tickers with symbol, name, currency, stockExchange, exchangeShortName
+    """),
+    (_make_query_tool, "search_name", "search-name", "Searching for company name",
+     """Company Name Search - Use when you want to search companies or ETFs by name 
+    and retrieve associated ticker symbols and exchange information.
+    
+    Args:
+        query: Company or ETF name to search
+        
+    Returns:
+        List of matching companies with symbol, name, currency, stockExchange, exchangeShortName
+    """),
+    (_make_symbol_tool, "get_quote", "quote", "Getting quote for",
+     """Stock Quote API - Retrieves real-time stock price, change, and volume for a given ticker.
+    Copilot should use this when the user asks for the current stock price.
+    
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        
+    Returns:
+        List with quote data including price, change, volume, marketCap, etc.
+    """),
+    (_make_symbol_tool, "get_company_profile", "profile", "Getting company profile for",
+     """Company Profile (SEC) - Retrieves detailed company profile such as industry, sector,
+    CEO, market cap, website, and more.
+    Copilot should call this when the user asks about a company overview.
+    
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        
+    Returns:
+        List with company profile including name, industry, sector, CEO, website, description, etc.
+    """),
+    (_make_statement_tool, "get_income_statement", "income-statement", "Getting income statement for",
+     """Income Statement - Retrieves annual or quarterly income statements for a company.
+    Use for revenue, gross profit, operating income, and net income analysis.
+    
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        period: "annual" or "quarter" (default: "annual")
+        limit: Number of periods to return (default: 5)
+        
+    Returns:
+        List of income statements with revenue, expenses, profit metrics, EPS, etc.
+    """),
+    (_make_statement_tool, "get_balance_sheet", "balance-sheet-statement", "Getting balance sheet for",
+     """Balance Sheet Statement - Retrieves balance sheet data including assets, liabilities,
+    and shareholder equity. Copilot should use this when the user
+    asks for a balance sheet or financial position.
+    
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        period: "annual" or "quarter" (default: "annual")
+        limit: Number of periods to return (default: 5)
+        
+    Returns:
+        List of balance sheets with assets, liabilities, equity, etc.
+    """),
+    (_make_statement_tool, "get_cash_flow", "cash-flow-statement", "Getting cash flow statement for",
+     """Cash Flow Statement - Retrieves cash flow statements (operating, investing, financing).
+    
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        period: "annual" or "quarter" (default: "annual")
+        limit: Number of periods to return (default: 5)
+        
+    Returns:
+        List of cash flow statements with operating, investing, and financing activities
+    """),
+]
+
+# Historical Price & Volume Data (hand-written: streaming + pre-serialization)
+async def get_historical_prices(
+    symbol: str,
+    ctx: Context[ServerSession, None],
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None
+) -> dict | str:
+    """Historical Price & Volume Data - Retrieves end-of-day historical price and
+    volume for a date window, newest first. Use for charts, trend analysis, or
+    backtesting. Defaults to the last year; a single call covers at most five
+    years, and next_cursor gives the to_date for the next older page when the
+    requested window was larger.
+
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+        from_date: Start date in YYYY-MM-DD format (default: one year before to_date)
+        to_date: End date in YYYY-MM-DD format (default: today)
+
+    Returns:
+        Object with symbol, from, to, historical array containing date, open,
+        high, low, close, volume, and next_cursor (date string or null)
+    """
+    await ctx.info(f"Getting historical prices for: {symbol}")
+
+    sym = _require_symbol(symbol)
+    end = _require_date(to_date) if to_date else date.today()
+    start = _require_date(from_date) if from_date else end - timedelta(days=365)
+    if start > end:
+        raise McpError(_DATE_ORDER)
+
+    next_cursor = None
+    if (end - start).days > _MAX_HISTORY_DAYS:
+        # Serve the newest page of the window; the cursor is the to_date the
+        # agent should pass (with the same from_date) to fetch the next page
+        start = end - timedelta(days=_MAX_HISTORY_DAYS)
+        next_cursor = (start - timedelta(days=1)).isoformat()
+
+    # Note: The endpoint is /historical-price-eod/full/{symbol}; it returns a
+    # flat JSON array of bars which is streamed and parsed incrementally
+    bars = await fmp_api_call_stream(
+        f"historical-price-eod/full/{sym}",
+        {"from": start.isoformat(), "to": end.isoformat()},
+        ctx
+    )
+    payload = {
+        "symbol": sym,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "historical": bars,
+        "next_cursor": next_cursor
+    }
+    if len(bars) > _PRESERIALIZE_THRESHOLD:
+        # Re-encoding years of OHLCV rows with pydantic would block the event
+        # loop and stall every concurrent call. Dump with orjson in a worker
+        # thread and return the JSON text; FastMCP passes strings through to
+        # the client without re-encoding.
+        blob = await asyncio.get_running_loop().run_in_executor(
+            None, orjson.dumps, payload
+        )
+        return blob.decode()
+    return payload
+
+
+# Company Snapshot (batched)
+async def get_company_snapshot(
+    symbol: str,
+    ctx: Context[ServerSession, None]
+) -> dict:
+    """Company Snapshot - Retrieves profile, quote, income statement, balance sheet,
+    and cash flow for one company in a single call. The five FMP requests run
+    concurrently, so this is much faster than calling the individual tools in sequence.
+    Copilot should use this when the user asks for a full financial picture of a company.
+
+    Args:
+        symbol: Stock ticker symbol (e.g., AAPL, MSFT, TSLA)
+
+    Returns:
+        Object with profile, quote, income_statement, balance_sheet, and cash_flow keys
+    """
+    await ctx.info(f"Getting company snapshot for: {symbol}")
+
+    sym = _require_symbol(symbol)
+    statement_params = {"symbol": sym, "period": "annual", "limit": 5}
+    profile, quote, income, balance, cash_flow = await asyncio.wait_for(
+        asyncio.gather(
+            fmp_api_call("profile", {"symbol": sym}, ctx),
+            fmp_api_call("quote", {"symbol": sym}, ctx),
+            fmp_api_call("income-statement", dict(statement_params), ctx),
+            fmp_api_call("balance-sheet-statement", dict(statement_params), ctx),
+            fmp_api_call("cash-flow-statement", dict(statement_params), ctx)
+        ),
+        timeout=20.0
+    )
+
+    return {
+        "symbol": sym,
+        "profile": profile,
+        "quote": quote,
+        "income_statement": income,
+        "balance_sheet": balance,
+        "cash_flow": cash_flow
+    }
+
+
+# Batch Stock Quotes
+async def get_quotes_batch(
+    symbols: list[str],
+    ctx: Context[ServerSession, None]
+) -> list[dict]:
+    """Batch Stock Quotes - Retrieves real-time quotes for several tickers at once.
+    The per-symbol requests run concurrently, so use this instead of repeated
+    get_quote calls when the user asks about multiple stocks.
+
+    Args:
+        symbols: List of stock ticker symbols (e.g., ["AAPL", "MSFT", "TSLA"])
+
+    Returns:
+        List of quote objects, one per symbol, in the same order as the input
+    """
+    await ctx.info(f"Getting quotes for: {symbols}")
+
+    if not symbols:
+        raise McpError(ErrorData(
+            code=INVALID_PARAMS,
+            message="Symbols parameter cannot be empty"
+        ))
+
+    # Validate every symbol before creating any coroutine so a bad element
+    # cannot leave earlier fmp_api_call coroutines dangling un-awaited
+    syms = [_require_symbol(s) for s in symbols]
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            *(fmp_api_call("quote", {"symbol": s}, ctx) for s in syms)
+        ),
+        timeout=20.0
+    )
+    # Each quote endpoint returns a one-element list; flatten for the agent
+    return [r[0] if isinstance(r, list) and r else r for r in results]
+
+def register(mcp: FastMCP) -> None:
+    """Register every FMP tool on the given FastMCP server."""
+    for factory, name, endpoint, label, doc in _TOOLS:
+        factory(mcp, name, endpoint, label, doc)
+    mcp.tool()(get_historical_prices)
+    mcp.tool()(get_company_snapshot)
+    mcp.tool()(get_quotes_batch)
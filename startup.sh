@@ -6,4 +6,4 @@ python -m pip install --upgrade pip
 pip install -r requirements.txt
 
 # Start the server using uvicorn
-python -m uvicorn server:app --host 0.0.0.0 --port 8000
+python -m uvicorn server:app --host 0.0.0.0 --port 8000 --loop uvloop